@@ -12,36 +12,43 @@
 
     Command line tool to rename Image and Video files from
     non-informative IMG_4040.JPG form to more informative,
-    for example: IMG_20060302T080020_Canon-EOS10D.jpg
+    for example: IMG_20060302T080020+1100_Canon-EOS10D.jpg
 
-    It uses one of two modules (depending on their availablility):
-      - exiftool_
-      - pyexifinfo_
+    It uses the exiftool_ module when available, and falls back to
+    driving the ``exiftool`` command line tool directly otherwise.
 
     Renames Image and Video files according to defined mask.
-      - ``IMG_<YYYYMMDD>T<HH24MISS>_<Camera_model>.<ext>``
-      - ``VID_<YYYYMMDD>T<HH24MISS>_<Camera_model>.<ext>``
+      - ``IMG_<YYYYMMDD>T<HH24MISS><±HHMM>_<Camera_model>.<ext>``
+      - ``VID_<YYYYMMDD>T<HH24MISS><±HHMM>_<Camera_model>.<ext>``
 
     Where:
       - ``YYYYMMDD`` - date, i.e. 20161231
       - ``HH24MISS`` - time, i.e. 195521
+      - ``±HHMM`` - UTC offset from the EXIF date, i.e. +1100. If the
+        EXIF date carries no offset, the local timezone is used.
       - ``Camera model`` - EXIF camera model. If not present ``noEXIF``
         value is used.
       - ``ext`` - original file extension.
 
 
     .. _exiftool: https://github.com/smarnach/pyexiftool
-    .. _pyexifinfo: https://github.com/guinslym/pyexifinfo
 
 
 """
-import filecmp
-import glob
+import ctypes
+import errno
+import hashlib
+import json
 import logging
 import os
+import pickle
+import re
+import subprocess
 import sys
-from Queue import Queue
-from threading import Lock, Thread
+import tempfile
+from datetime import datetime
+from functools import lru_cache
+from multiprocessing import Pool
 
 from dateutil import parser
 
@@ -49,80 +56,100 @@ try:
     import exiftool
     fast_exif = True
 except ImportError:
-    import pyexifinfo
     fast_exif = False
 
-ABBREVIATIONS = {'image': 'IMG', 'video': 'VID'}
-MAX_THREADS = 4
-
-
-class ClosableQueue(Queue):
-    SENTINEL = object()
-
-    def close(self):
-        self.put(self.SENTINEL)
+try:
+    import ciso8601
+except ImportError:
+    ciso8601 = None
 
-    def __iter__(self):
-        while True:
-            item = self.get()
-            try:
-                if item is self.SENTINEL:
-                    return
-                yield item
-            finally:
-                self.task_done()
-
-
-class Renamer(Thread):
-    """Renamer thread class"""
-
-    def __init__(self, file_queue, exception_q,
-                 exiftool_handle, exiftool_lock):
-        super(Renamer, self).__init__()
-        self.file_queue = file_queue
-        self.exiftool_handle = exiftool_handle
-        self.lock = exiftool_lock
-        self.exception_q = exception_q
-
-    def get_metadata(self, filename):
-        """Gets the metadata from filename, returns dict"""
-        if self.exiftool_handle is not None and self.lock is not None:
-            with self.lock:
-                meta = self.exiftool_handle.get_metadata(filename)
-                if meta.get('ExifTool:Error'):
-                    pass
-        else:
-            try:
-                meta = pyexifinfo.get_json(filename)[0]
-            except ValueError:
-                pass
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-        return meta
+LOGGER = logging.getLogger(__name__)
 
-    def run(self):
-        """Runner"""
-        for filename in self.file_queue:
-            try:
-                self.process_file(filename)
-            except Exception as e:
-                self.exception_q.put(e)
-
-    def process_file(self, filename):
-        """Process a single file"""
-        md = self.get_metadata(filename)
-        mime = md.get('File:MIMEType', 'Unknown')
-        if not (mime.startswith('image') or
-                mime.startswith('video')):
-            return
+ABBREVIATIONS = {'image': 'IMG', 'video': 'VID'}
+MAX_THREADS = 4
+# files per stay-open exiftool round-trip
+EXIFTOOL_BATCH_SIZE = 100
+
+# persistent metadata cache: maps absolute path to
+# (st_mtime_ns, st_size, metadata); reruns over a large library then
+# cost a stat per file instead of an exiftool pass
+CACHE_FILE = os.path.join(
+    os.path.expanduser('~'), '.cache', 'extool', 'metadata.pickle')
+# only extract the tags this tool reads; -fast2 stops exiftool from
+# scanning beyond the metadata section of each file
+EXIFTOOL_ARGS = (
+    '-fast2',
+    '-EXIF:Model', '-QuickTime:Model',
+    '-EXIF:DateTimeOriginal', '-QuickTime:CreationDate',
+    '-QuickTime:MediaCreateDate', '-File:FileModifyDate',
+    '-File:MIMEType', '-File:FileTypeExtension', '-File:FileName',
+)
+
+# tags checked in order of preference, first non-empty wins
+_MODEL_TAGS = (
+    'EXIF:Model',
+    'QuickTime:Model',
+)
+_DATE_TAGS = (
+    'EXIF:DateTimeOriginal',
+    'QuickTime:CreationDate',
+    'QuickTime:MediaCreateDate',
+    'File:FileModifyDate',
+)
+
+# known EXIF date layouts, tried before falling back to dateutil
+EXIF_DATETIME_TZ_FMT = "%Y:%m:%d %H:%M:%S%z"
+EXIF_DATETIME_FMT = "%Y:%m:%d %H:%M:%S"
+
+# local timezone, resolved once at import; attached to naive EXIF dates
+# so %z formatting never re-queries the system timezone per file
+_LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+# extensions worth sending to exiftool; everything else is skipped
+# without ever spawning a metadata lookup
+IMAGE_VIDEO_EXTS = frozenset((
+    '.jpg', '.jpeg', '.heic', '.heif', '.png', '.tif', '.tiff',
+    '.cr2', '.cr3', '.nef', '.arw', '.dng', '.raf', '.rw2',
+    '.mov', '.mp4', '.m4v', '.avi', '.3gp', '.mts', '.mkv'))
+
+# a name already matching the output mask (with optional timezone and
+# conflict parts) does not need metadata at all on a rerun
+_ALREADY_NAMED = re.compile(
+    r'^(IMG|VID)_\d{8}T\d{6}([+-]\d{4})?(-\d+)?_.+\.[A-Za-z0-9]+$')
+
+
+def process_file(item):
+    """Pool worker: renames a single file from pre-fetched metadata
+
+    :param tuple item: ``(filename, metadata)`` pair
+    :return: ``(filename, error)`` tuple, error is ``None`` on success
+    """
+    filename, md = item
+    try:
+        mime = md.get('File:MIMEType') or ''
+        if not mime.startswith(('image', 'video')):
+            return filename, None
         if rename(filename, md):
-            logger.info("Renamed: %s", filename)
+            LOGGER.info("Renamed: %s", filename)
         else:
-            logger.error("Failed to rename %s", filename)
+            LOGGER.error("Failed to rename %s", filename)
+    except Exception as e:
+        return filename, str(e)
+    return filename, None
 
 
+@lru_cache(maxsize=128)
 def slugify(string):
     """makes the camera name OS friendly
 
+    Cached: a shoot produces thousands of files with the same handful
+    of camera names.
+
     :param str string: camera name from exif
     :return: sluggified OS friendly name
     """
@@ -131,23 +158,103 @@ def slugify(string):
             .replace(' ', '-') if string else 'noEXIF')
 
 
+def _first_model(exif, _keys=_MODEL_TAGS):
+    """returns the first non-empty model tag value, or ``None``
+
+    The tag tuple is closed over as a default argument, keeping the
+    per-call work to a single C-level generator run.
+    """
+    return next((v for v in map(exif.get, _keys) if v), None)
+
+
+def _first_date(exif, _keys=_DATE_TAGS):
+    """returns the first usable date tag value, or ``None``
+
+    Skips empty values and the '0000...' placeholders some cameras
+    write; the tag tuple and the skip condition are baked in.
+    """
+    return next(
+        (v for v in map(exif.get, _keys)
+         if v and not v.startswith('0000')), None)
+
+
+# one-slot cache for get_model(): consecutive files of a shoot nearly
+# always share the camera model (per process, as are the pool workers)
+_last_model_raw = ''
+_last_model_slug = None
+
+
 def get_model(exif):
     """gets camera model from EXIF
 
     :param dict exif: EXIF data
     :return: sluggified model
     """
-    ret = None
-    tags = (
-        'EXIF:Model',
-        'QuickTime:Model'
-    )
-    for tag in tags:
-        ret = exif.get(tag)
-        if ret:
-            break
+    global _last_model_raw, _last_model_slug
+    raw = _first_model(exif)
+    if raw == _last_model_raw:
+        return _last_model_slug
+    _last_model_raw = raw
+    _last_model_slug = slugify(raw)
+    return _last_model_slug
 
-    return slugify(ret)
+
+@lru_cache(maxsize=1 << 15)
+def _parse_and_format(dttm_str, output_fmt):
+    """parses a single EXIF date string and formats it
+
+    Cached on the input string: bursts, video frames and live photo
+    pairs repeat identical date strings, and a repeat costs a dict
+    lookup instead of a parse.
+
+    :param str dttm_str: EXIF date string
+    :param str output_fmt: output format
+    :return: date in the specified format
+    :rtype: str
+    """
+    # 2 possible formats:
+    # 2016:12:11 13:34:33+13:00
+    # 2016:11:06 02:59:05
+    dttm = None
+    if len(dttm_str) == 19:
+        # plain timestamp: direct construction beats any
+        # format-string parser
+        try:
+            dttm = datetime(
+                int(dttm_str[:4]), int(dttm_str[5:7]),
+                int(dttm_str[8:10]), int(dttm_str[11:13]),
+                int(dttm_str[14:16]), int(dttm_str[17:19]))
+        except ValueError:
+            dttm = None
+    if dttm is None and ciso8601 is not None:
+        # C parser wants ISO 8601: 2016-12-11T13:34:33+13:00
+        try:
+            dttm = ciso8601.parse_datetime(
+                dttm_str.replace(':', '-', 2).replace(' ', 'T', 1))
+        except ValueError:
+            pass
+    if dttm is None:
+        if len(dttm_str) == 25:
+            # strptime expects +HHMM, EXIF gives +HH:MM
+            dttm_str = dttm_str[:22] + dttm_str[23:]
+        try:
+            dttm = datetime.strptime(dttm_str, EXIF_DATETIME_TZ_FMT)
+        except ValueError:
+            try:
+                dttm = datetime.strptime(dttm_str, EXIF_DATETIME_FMT)
+            except ValueError:
+                # unexpected layout, let dateutil have a go at it,
+                # with the date separators swapped by known offsets
+                try:
+                    dttm = parser.parse(
+                        dttm_str[:4] + '/' + dttm_str[5:7] + '/'
+                        + dttm_str[8:])
+                except ValueError:
+                    LOGGER.error("Failed on %s", dttm_str)
+                    raise
+    if dttm.tzinfo is None:
+        dttm = dttm.replace(tzinfo=_LOCAL_TZ)
+    return dttm.strftime(output_fmt)
 
 
 def get_date(exif, output_fmt="%Y%m%dT%H%M%S%z"):
@@ -159,34 +266,20 @@ def get_date(exif, output_fmt="%Y%m%dT%H%M%S%z"):
     :return: date in the specified format
     :rtype: str
     """
-    ret = None
-    tags = (
-        'EXIF:DateTimeOriginal',
-        'QuickTime:CreationDate',
-        'QuickTime:MediaCreateDate',
-        'File:FileModifyDate',
-    )
-    for tag in tags:
-        dttm_str = exif.get(tag)
-        if not dttm_str or dttm_str.startswith('0000'):
-            continue
-        # 2 possible formats:
-        # 2016:12:11 13:34:33+13:00
-        # 2016:11:06 02:59:05
-        dttm_str = dttm_str.replace(':', '/', 2)
-        try:
-            dttm = parser.parse(dttm_str)
-        except ValueError:
-            sys.stderr.write("Failed on {0}\n".format(dttm_str))
-            raise
-        if not dttm:
-            # unsuccessfull conversion
-            raise ValueError(
-                "Error converting following date: {0} in file: {1}"
-                .format(dttm_str, exif.get('File:FileName')))
-        ret = dttm.strftime(output_fmt)
-        break
-    return ret
+    dttm_str = _first_date(exif)
+    if dttm_str is None:
+        return None
+    return _parse_and_format(dttm_str, output_fmt)
+
+
+@lru_cache(maxsize=32)
+def _prefix_for_mime(mime):
+    """maps a MIME type to the filename prefix, cached per MIME string
+
+    :param str mime: MIME type, may be ``None``
+    :return: file type prefix or ``None``
+    """
+    return ABBREVIATIONS.get(mime.partition('/')[0]) if mime else None
 
 
 def get_prefix(exif):
@@ -194,10 +287,40 @@ def get_prefix(exif):
     :param dict exif: EXIF data
     :return: file type prefix
     """
-    ret = None
-    mime = exif.get('File:MIMEType')
-    ret = ABBREVIATIONS.get(mime.split('/')[0]) if mime else None
-    return ret
+    return _prefix_for_mime(exif.get('File:MIMEType'))
+
+
+def _compute_parts(exif):
+    """Computes the filename parts that do not depend on the retry count
+
+    :param dict exif: EXIF data
+    :return: ``(prefix, date, model, ext)`` tuple, or ``None`` if the
+        file type is not recognized
+    """
+    prefix = get_prefix(exif)
+    if prefix is None:
+        return None
+    return (prefix, get_date(exif), get_model(exif),
+            exif.get('File:FileTypeExtension'))
+
+
+def _format_name(parts, retry=0, path=None):
+    """Formats the filename from precomputed parts
+
+    :param tuple parts: ``(prefix, date, model, ext)`` from
+        :func:`_compute_parts`
+    :param int retry: conflict counter
+    :param str path: directory of the file, for the live photo check
+
+    :return: file name
+    :rtype: str
+    """
+    prefix, date, model, ext = parts
+    conflict = '' if retry == 0 else "-{}".format(retry)
+    live_counterpart = check_for_live(date, conflict, ext, path)
+    if live_counterpart:
+        return live_counterpart
+    return '{0}_{1}{2}_{3}.{4}'.format(prefix, date, conflict, model, ext)
 
 
 def generate_name(exif, retry=0, path=None):
@@ -207,20 +330,42 @@ def generate_name(exif, retry=0, path=None):
     :return: file name
     :rtype: str
     """
-    ret = None
-    prefix = get_prefix(exif)
-    ext = exif.get('File:FileTypeExtension')
-    if prefix is not None:
-        date = get_date(exif)
-        conflict = '' if retry == 0 else "-{}".format(retry)
-        model = get_model(exif)
-        live_counterpart = check_for_live(date, conflict, ext, path)
-        if live_counterpart:
-            ret = live_counterpart
-        else:
-            ret = ('{0}_{1}{2}_{3}.{4}'.format(
-                prefix, date, conflict, model, ext))
-    return ret
+    parts = _compute_parts(exif)
+    if parts is None:
+        return None
+    return _format_name(parts, retry, path)
+
+
+# per-process cache of directory listings for check_for_live();
+# renames done by this process keep it current
+_DIR_LISTINGS = {}
+
+
+def _refresh_dir_listing(dirname):
+    """Re-reads the listing of ``dirname`` and updates the cache"""
+    names = set(os.listdir(dirname))
+    _DIR_LISTINGS[dirname] = names
+    return names
+
+
+def _dir_listing(dirname):
+    """Returns a cached set of names in ``dirname``, reading it once
+
+    :param str dirname: directory to list
+    :return: set of basenames
+    """
+    names = _DIR_LISTINGS.get(dirname)
+    if names is None:
+        names = _refresh_dir_listing(dirname)
+    return names
+
+
+def _note_rename(dirname, old_name, new_name):
+    """Updates the cached listing of ``dirname`` after a rename"""
+    names = _DIR_LISTINGS.get(dirname)
+    if names is not None:
+        names.discard(old_name)
+        names.add(new_name)
 
 
 def check_for_live(date, conflict, ext, path=None):
@@ -237,21 +382,134 @@ def check_for_live(date, conflict, ext, path=None):
     """
     # TODO Possibly support HEVC/HEIC in the future.
     if ext == 'MOV':
-        # chop the time zone part
-        if '+' in date:
-            date = date[:date.index('+')]
-        suspect_glob = ("%s_%s%s_*.%s"
-                        % (ABBREVIATIONS['image'], date, conflict, 'JPG'))
-        suspects = glob.glob(os.path.join(path, suspect_glob))
+        # chop the time zone part: the pair shares the wall-clock time
+        # but the offsets may differ (the JPG may carry the local one)
+        date = date[:15]
+        suspect_re = re.compile(
+            "%s_%s([+-]\\d{4})?%s_.+\\.JPG$"
+            % (ABBREVIATIONS['image'], re.escape(date),
+               re.escape(conflict)))
+        suspects = [name for name in _dir_listing(path)
+                    if suspect_re.match(name)]
+        if not suspects:
+            # the cached listing may predate the counterpart's rename
+            # in another worker process; re-read before giving up
+            suspects = [name for name in _refresh_dir_listing(path)
+                        if suspect_re.match(name)]
         if not suspects:
             return None
         if len(suspects) > 1:
-            logging.warning("check_for_live: More than one match: %r",
-                            suspects)
+            LOGGER.warning("check_for_live: More than one match: %r",
+                           suspects)
             return None
         return os.path.splitext(suspects[0])[0] + "." + ext
 
 
+# Linux renameat2() with RENAME_NOREPLACE fuses the exists-check and
+# the rename into one atomic syscall; other platforms use link+unlink
+_RENAME_NOREPLACE = 1
+_AT_FDCWD = -100
+_renameat2 = None
+if sys.platform.startswith('linux'):
+    try:
+        _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+        _renameat2 = _libc.renameat2
+        _renameat2.argtypes = (ctypes.c_int, ctypes.c_char_p,
+                               ctypes.c_int, ctypes.c_char_p,
+                               ctypes.c_uint)
+    except (OSError, AttributeError):
+        _renameat2 = None
+
+
+def _rename_noreplace(file_from, file_to):
+    """Renames a file, failing instead of clobbering an existing target
+
+    On Linux this is a single renameat2(RENAME_NOREPLACE) syscall;
+    elsewhere link+unlink gives the same collision detection in two.
+    Either way there is no separate stat and no TOCTOU window between
+    the existence check and the rename.  Falls back to the non-atomic
+    check on filesystems supporting neither, e.g. FAT camera cards.
+
+    :param str file_from: initial file name
+    :param str file_to: target file name
+    :return: True if renamed, False if the target already exists
+    :rtype: bool
+    """
+    if _renameat2 is not None:
+        ret = _renameat2(_AT_FDCWD, os.fsencode(file_from),
+                         _AT_FDCWD, os.fsencode(file_to),
+                         _RENAME_NOREPLACE)
+        if ret == 0:
+            return True
+        err = ctypes.get_errno()
+        if err == errno.EEXIST:
+            return False
+        if err not in (errno.ENOSYS, errno.EINVAL):
+            raise OSError(err, os.strerror(err), file_from)
+        # kernel or filesystem without renameat2, use the fallbacks
+    try:
+        os.link(file_from, file_to)
+    except FileExistsError:
+        return False
+    except OSError:
+        # no hardlinks on this filesystem
+        if os.path.exists(file_to):
+            return False
+        os.rename(file_from, file_to)
+        return True
+    os.unlink(file_from)
+    return True
+
+
+# per-process cache of content digests, keyed on (path, size, mtime);
+# collision retries on the same source file hit this instead of
+# re-reading the file on every iteration
+_DIGEST_CACHE = {}
+
+
+def _file_digest(path, st):
+    """Returns the content digest of a file, cached on its stat data
+
+    :param str path: file to digest
+    :param st: ``os.stat`` result for the file
+    :return: blake2b digest of the contents
+    :rtype: bytes
+    """
+    key = (path, st.st_size, st.st_mtime_ns)
+    digest = _DIGEST_CACHE.get(key)
+    if digest is None:
+        blake = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                blake.update(chunk)
+        digest = blake.digest()
+        _DIGEST_CACHE[key] = digest
+    return digest
+
+
+def _same_contents(file_from, file_to):
+    """Checks whether two existing files have identical contents
+
+    Compares the cheap stat fields first: the same inode on the same
+    device is a hardlink to the same data, and differing sizes rule out
+    equality without reading either file.  Size-equal pairs are
+    compared by cached content digest, so a burst of collisions reads
+    each file at most once instead of per retry.
+
+    :param str file_from: first file
+    :param str file_to: second file
+    :return: True if the contents match
+    :rtype: bool
+    """
+    s_from = os.stat(file_from)
+    s_to = os.stat(file_to)
+    if s_from.st_ino == s_to.st_ino and s_from.st_dev == s_to.st_dev:
+        return True
+    if s_from.st_size != s_to.st_size:
+        return False
+    return _file_digest(file_from, s_from) == _file_digest(file_to, s_to)
+
+
 def rename(file_from, exif, max_rename=20):
     """ Rename the file
 
@@ -263,84 +521,267 @@ def rename(file_from, exif, max_rename=20):
     """
     retry_count = 0
     renamed = False
-    this_logger = logging.getLogger(__name__)
+    dirname = os.path.dirname(file_from) or '.'
+    # invariant under retries: only the conflict suffix changes
+    parts = _compute_parts(exif)
     while not renamed:
-        file_to = os.path.join(os.path.dirname(file_from),
-                               generate_name(exif,
-                                             retry_count,
-                                             os.path.dirname(file_from)))
-        if os.path.exists(file_to):
-            if filecmp.cmp(file_from, file_to):
-                renamed = True
-                this_logger.warning('File already exists: %s', file_to)
-            else:
-                if retry_count > max_rename:
-                    break
-                retry_count += 1
+        # dirname is known clean, skip the os.path.join machinery
+        file_to = dirname + os.sep + _format_name(parts, retry_count,
+                                                  dirname)
+        if _rename_noreplace(file_from, file_to):
+            _note_rename(dirname,
+                         os.path.basename(file_from),
+                         os.path.basename(file_to))
+            renamed = True
+        elif _same_contents(file_from, file_to):
+            renamed = True
+            LOGGER.warning('File already exists: %s', file_to)
         else:
-            try:
-                os.rename(file_from, file_to)
-                renamed = True
-            except OSError as e:
-                renamed = True
+            if retry_count > max_rename:
+                break
+            retry_count += 1
     return renamed
 
 
-def get_metadata(filename, exiftool_handle):
-    if exiftool_handle:
-        md = exiftool_handle.get_metadata(filename)
-        if md.get('ExifTool:Error'):
-            pass
-    else:
-        try:
-            md = pyexifinfo.get_json(filename)[0]
-        except ValueError:
-            pass
+def _metadata_batch(exiftool_handle, batch):
+    """Fetches metadata for a batch of files in one exiftool round-trip
 
-    return md
+    Unlike ``get_metadata_batch``, passes ``EXIFTOOL_ARGS`` so exiftool
+    only decodes the handful of tags the tool reads instead of every
+    tag it knows about, shrinking both its parse time and the JSON
+    payload.
 
+    :param exiftool_handle: running exiftool instance
+    :param list batch: file paths
+    :return: list of metadata dicts, one per file
+    """
+    if _worker_et_restricted:
+        # tag list already registered via common_args
+        return exiftool_handle.execute_json(*batch)
+    return exiftool_handle.execute_json(*(EXIFTOOL_ARGS + tuple(batch)))
 
-def process_dir(path, exiftool_handle, exiftool_lock):
-    file_queue = ClosableQueue(32)
-    exception_q = Queue()
 
-    threads = [Renamer(file_queue, exception_q,
-                       exiftool_handle, exiftool_lock)
-               for _ in range(0, MAX_THREADS)]
+def _metadata_batch_cli(batch):
+    """Fetches metadata for a batch of files with one exiftool run
+
+    Fallback for when the exiftool module (and its stay-open process)
+    is not available: a single ``exiftool -j -@ argfile`` invocation
+    replaces one subprocess per file.
+
+    :param list batch: file paths
+    :return: list of metadata dicts
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.args',
+                                     delete=False) as argfile:
+        argfile.write('\n'.join(batch))
+    try:
+        out = subprocess.run(
+            ['exiftool', '-j', '-G'] + list(EXIFTOOL_ARGS)
+            + ['-@', argfile.name],
+            capture_output=True).stdout
+    finally:
+        os.unlink(argfile.name)
+    if not out:
+        return []
+    return orjson.loads(out) if orjson is not None else json.loads(out)
+
+
+def _metadata_pairs(exiftool_handle, batch):
+    """Returns ``(filename, metadata)`` pairs for one batch of files
+
+    Pairs results by their SourceFile key rather than by position:
+    exiftool omits files it cannot open from its output, and a
+    positional zip would shift every later dict onto the wrong file.
+    Files without a result are absent from the returned list.
+    """
+    if exiftool_handle is None:
+        mds = _metadata_batch_cli(batch)
+    else:
+        mds = _metadata_batch(exiftool_handle, batch)
+    return [(md.get('SourceFile'), md) for md in mds]
 
-    for thread in threads:
-        thread.start()
 
-    for root, _, files in os.walk(path):
-        for filename in files:
-            file_queue.put(os.path.join(root, filename))
+def _load_cache():
+    """Loads the persistent metadata cache, empty dict if unreadable"""
+    try:
+        with open(CACHE_FILE, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        return {}
 
-    # each thread will receive the signal.
-    for _ in range(0, MAX_THREADS):
-        file_queue.close()
 
-    file_queue.join()
+def _save_cache(cache):
+    """Writes the metadata cache back to disk in one go
 
-    if not exception_q.empty():
+    Entries whose file no longer exists (renamed or deleted since they
+    were recorded) are dropped, so the cache cannot grow without bound
+    across runs.
+    """
+    cache = {path: entry for path, entry in cache.items()
+             if os.path.exists(path)}
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    tmp_file = CACHE_FILE + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(cache, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, CACHE_FILE)
+
+
+def _batches(files, size=EXIFTOOL_BATCH_SIZE):
+    """Groups an iterable of paths into lists of at most ``size``"""
+    batch = []
+    for filename in files:
+        batch.append(filename)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def walk_media_files(path):
+    """Walks the directory tree yielding paths of media files
+
+    Uses :func:`os.scandir` rather than :func:`os.walk` so the cached
+    ``DirEntry`` type information is reused instead of re-stat'ing every
+    entry, and filters on extension before the file ever reaches
+    exiftool.
+
+    :param str path: directory to walk
+    :return: generator of file paths
+    """
+    dirs = [path]
+    while dirs:
+        current = dirs.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError as e:
+            # match os.walk, which skips unreadable directories
+            LOGGER.warning("cannot read directory %s: %s", current, e)
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if (ext in IMAGE_VIDEO_EXTS
+                            and not _ALREADY_NAMED.match(entry.name)):
+                        yield entry.path
+
+
+# per-worker-process state, set up by _init_worker()
+_worker_et = None
+_worker_et_restricted = False
+_worker_cache = {}
+
+
+def _init_worker():
+    """Pool initializer: starts this worker's own exiftool instance
+    and loads the persistent metadata cache
+
+    The restricted tag list is registered once as exiftool common_args
+    where pyexiftool supports it, so batch round-trips only carry file
+    paths; otherwise the tags are passed per call.
+    """
+    global _worker_et, _worker_et_restricted, _worker_cache
+    if fast_exif:
+        try:
+            _worker_et = exiftool.ExifTool(
+                common_args=['-G', '-n'] + list(EXIFTOOL_ARGS))
+            _worker_et_restricted = True
+        except TypeError:
+            # older pyexiftool without the common_args parameter
+            _worker_et = exiftool.ExifTool()
+        _worker_et.start()
+    _worker_cache = _load_cache()
+
+
+def process_batch(batch):
+    """Pool worker: extracts metadata for a batch of files and renames
+
+    Files whose (mtime, size) match the persistent cache skip the
+    exiftool pass entirely; freshly extracted metadata is returned to
+    the parent so it can be added to the cache.
+
+    :param list batch: file paths
+    :return: ``(results, new_entries)``: a list of ``(filename,
+        error)`` tuples and a dict of new cache entries
+    """
+    hits = []
+    misses = []
+    for filename in batch:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            continue
+        abspath = os.path.abspath(filename)
+        cached = _worker_cache.get(abspath)
+        if (cached is not None and cached[0] == st.st_mtime_ns
+                and cached[1] == st.st_size):
+            hits.append((filename, cached[2]))
+        else:
+            misses.append((abspath, st))
+    pairs = []
+    results = []
+    md_by_path = {}
+    if misses:
+        pairs = _metadata_pairs(_worker_et,
+                                [abspath for abspath, _ in misses])
+        md_by_path = {os.path.abspath(f): md for f, md in pairs}
+        for abspath, st in misses:
+            if abspath not in md_by_path:
+                results.append((abspath, "no metadata from exiftool"))
+    all_pairs = hits + pairs
+    # rename images first, so that live photo videos can find their
+    # already renamed JPG counterpart
+    all_pairs.sort(
+        key=lambda pair: (pair[1].get('File:MIMEType') or '')
+        .startswith('video'))
+    results += [process_file(pair) for pair in all_pairs]
+    # cache only files that kept their name (non-media, duplicates,
+    # failures): renamed files are skipped by _ALREADY_NAMED on reruns,
+    # so caching them under a now-gone path would never hit
+    new_entries = {}
+    for abspath, st in misses:
+        md = md_by_path.get(abspath)
+        if md is not None and os.path.exists(abspath):
+            new_entries[abspath] = (st.st_mtime_ns, st.st_size, md)
+    return results, new_entries
+
+
+def process_dir(path):
+    errors = []
+    new_entries = {}
+    pool = Pool(MAX_THREADS, initializer=_init_worker)
+    try:
+        results = pool.imap_unordered(
+            process_batch, _batches(walk_media_files(path)))
+        for batch_result, batch_entries in results:
+            new_entries.update(batch_entries)
+            for filename, error in batch_result:
+                if error:
+                    errors.append((filename, error))
+    finally:
+        pool.close()
+        pool.join()
+
+    if new_entries:
+        cache = _load_cache()
+        cache.update(new_entries)
+        _save_cache(cache)
+
+    if errors:
         sys.stderr.write("There were errors:\n")
-        while not exception_q.empty():
-            message = exception_q.get(block=False).message
-            if message:
-                sys.stderr.write("%s\n" % message)
+        for filename, error in errors:
+            sys.stderr.write("%s: %s\n" % (filename, error))
 
 
 if __name__ == '__main__':
 
     logging.basicConfig(level=logging.WARNING)
-    logger = logging.getLogger(__name__)
 
     if len(sys.argv) < 2:
         print("Usage: {0} <directory>".format(os.path.basename(sys.argv[0])))
         sys.exit(1)
 
-    if fast_exif:
-        with exiftool.ExifTool() as cm:
-            exiftool_lock = Lock()
-            process_dir(sys.argv[1], cm, exiftool_lock)
-    else:
-        process_dir(sys.argv[1], None, None)
+    process_dir(sys.argv[1])